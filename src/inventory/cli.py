@@ -50,22 +50,16 @@ def print_menu() -> None:
     print("8) Quitter")
 
 
-def render_inventory_table(products) -> str:
+def render_inventory_table(rows) -> str:
+    """Formate les lignes de `list_inventory_for_display` (Prix TTC déjà calculé en SQL)."""
     headers = ["ID", "SKU", "Nom", "Catégorie", "Prix HT", "TVA", "Prix TTC", "Stock"]
-    rows = []
-    for p in products:
-        unit_ttc = round(p.unit_price_ht * (1 + p.vat_rate), 2)
-        rows.append([
-            str(p.id or ""),
-            p.sku,
-            p.name,
-            p.category,
-            f"{p.unit_price_ht:.2f}",
-            f"{p.vat_rate:.2f}",
-            f"{unit_ttc:.2f}",
-            str(p.quantity),
-        ])
-    return format_table(headers, rows)
+    # Ordre des colonnes : celui de la requête d'affichage (id, sku, name, category,
+    # unit_price_ht, vat_rate, quantity, unit_ttc) ; dépaquetage positionnel, sans multiplication.
+    table = [
+        [str(pid), sku, name, category, f"{price_ht:.2f}", f"{vat:.2f}", f"{ttc:.2f}", str(qty)]
+        for pid, sku, name, category, price_ht, vat, qty, ttc in rows
+    ]
+    return format_table(headers, table)
 
 
 def action_initialize(app: InventoryManager) -> None:
@@ -77,11 +71,20 @@ def action_initialize(app: InventoryManager) -> None:
 
 
 def action_list_inventory(app: InventoryManager) -> None:
-    products = app.list_inventory()
-    if not products:
-        print("(inventaire vide)")
-        return
-    print("\n" + render_inventory_table(products))
+    page_size = app.config.page_size
+    after_sku = None
+    while True:
+        rows = app.list_inventory_for_display(limit=page_size, after_sku=after_sku)
+        if not rows:
+            if after_sku is None:
+                print("(inventaire vide)")
+            return
+        print("\n" + render_inventory_table(rows))
+        if len(rows) < page_size:
+            return
+        if _prompt("suite ? (o/N): ").lower() != "o":
+            return
+        after_sku = rows[-1]["sku"]
 
 
 def action_add_product(app: InventoryManager) -> None:
@@ -229,10 +232,23 @@ def action_dashboard(app: InventoryManager) -> None:
     print(f"CA TTC: {stats['ca_ttc']:.2f} €")
 
 
+# Choix du menu -> action (l'option 8, Quitter, est gérée dans la boucle).
+_ACTIONS = {
+    "1": action_initialize,
+    "2": action_list_inventory,
+    "3": action_add_product,
+    "4": action_update_product,
+    "5": action_delete_product,
+    "6": action_sell_product,
+    "7": action_dashboard,
+}
+
+
 def build_parser() -> argparse.ArgumentParser:
     p = argparse.ArgumentParser(description="Inventory CLI — starter kit")
     p.add_argument("--db", default="data/inventory.db", help="Chemin du fichier SQLite (.db)")
     p.add_argument("--log-level", default="INFO", help="DEBUG/INFO/WARNING/ERROR")
+    p.add_argument("--log-file", default="inventory.log", help="Fichier de log (vide = console seulement)")
     return p
 
 
@@ -240,50 +256,42 @@ def main() -> int:
     parser = build_parser()
     args = parser.parse_args()
 
-    configure_logging(log_level=args.log_level)
+    configure_logging(log_level=args.log_level, log_file=args.log_file)
     config = AppConfig(db_path=args.db)
     app = InventoryManager(config)
 
     logger.info("App started with db=%s", config.db_path)
 
-    while True:
-        try:
-            print_menu()
-            choice = _prompt("Votre choix (1-8) : ")
-
-            if choice == "1":
-                action_initialize(app)
-            elif choice == "2":
-                action_list_inventory(app)
-            elif choice == "3":
-                action_add_product(app)
-            elif choice == "4":
-                action_update_product(app)
-            elif choice == "5":
-                action_delete_product(app)
-            elif choice == "6":
-                action_sell_product(app)
-            elif choice == "7":
-                action_dashboard(app)
-            elif choice == "8":
-                print("au revoir.")
-                return 0
-            else:
-                print("choix pas bon. entre 1 et 8.")
-
-        except (ValidationError, DataImportError) as e:
-            logger.warning("Validation/import error: %s", e)
-            print(f"erreur: {e}")
-        except DatabaseError as e:
-            logger.error("Database error: %s", e)
-            print(f"erreur base de donnees: {e}")
-        except InventoryError as e:
-            logger.error("Inventory error: %s", e)
-            print(f"erreur: {e}")
-        except KeyboardInterrupt:
-            print("\ninterruption. au revoir.")
-            return 130
-        except Exception:
-            logger.exception("Unexpected error")
-            print("erreur inattendue. regarde les logs.")
-            return 1
+    try:
+        while True:
+            try:
+                print_menu()
+                choice = _prompt("Votre choix (1-8) : ")
+
+                action = _ACTIONS.get(choice)
+                if action:
+                    action(app)
+                elif choice == "8":
+                    print("au revoir.")
+                    return 0
+                else:
+                    print("choix pas bon. entre 1 et 8.")
+
+            except (ValidationError, DataImportError) as e:
+                logger.warning("Validation/import error: %s", e)
+                print(f"erreur: {e}")
+            except DatabaseError as e:
+                logger.error("Database error: %s", e)
+                print(f"erreur base de donnees: {e}")
+            except InventoryError as e:
+                logger.error("Inventory error: %s", e)
+                print(f"erreur: {e}")
+            except KeyboardInterrupt:
+                print("\ninterruption. au revoir.")
+                return 130
+            except Exception:
+                logger.exception("Unexpected error")
+                print("erreur inattendue. regarde les logs.")
+                return 1
+    finally:
+        app.close()
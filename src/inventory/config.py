@@ -19,3 +19,4 @@ class AppConfig:
     """Configuration de l'application."""
     db_path: str
     default_vat_rate: float = 0.20
+    page_size: int = 20
@@ -33,3 +33,7 @@ class DataImportError(InventoryError):
 
 class DatabaseError(InventoryError):
     """Erreur DB."""
+
+
+class DuplicateSkuError(DatabaseError):
+    """SKU déjà présent (contrainte UNIQUE violée)."""
@@ -13,18 +13,26 @@ Ce que vous devez faire :
 
 Note :
 - Ce starter kit configure console + fichier (rotation).
+- Le fichier n'est ouvert qu'au premier log écrit (`delay=True`) ;
+  `--log-file ""` désactive le fichier (console seule).
 """
 
 from __future__ import annotations
 
 import logging
 from logging.handlers import RotatingFileHandler
+from typing import Optional
 
 
-def configure_logging(log_level: str = "INFO", log_file: str = "inventory.log") -> None:
-    """Configure un logging simple : console + fichier avec rotation."""
+def configure_logging(log_level: str = "INFO", log_file: Optional[str] = "inventory.log") -> None:
+    """Configure un logging simple : console + fichier avec rotation (si `log_file`)."""
     level = getattr(logging, log_level.upper(), logging.INFO)
 
+    # Champs jamais affichés par notre format : inutile de les collecter à chaque log.
+    logging.logThreads = False
+    logging.logProcesses = False
+    logging.logMultiprocessing = False
+
     logger = logging.getLogger()
     logger.setLevel(level)
 
@@ -41,9 +49,10 @@ def configure_logging(log_level: str = "INFO", log_file: str = "inventory.log")
     ch.setLevel(level)
     ch.setFormatter(fmt)
 
-    fh = RotatingFileHandler(log_file, maxBytes=500_000, backupCount=3, encoding="utf-8")
-    fh.setLevel(level)
-    fh.setFormatter(fmt)
-
     logger.addHandler(ch)
-    logger.addHandler(fh)
+
+    if log_file:
+        fh = RotatingFileHandler(log_file, maxBytes=500_000, backupCount=3, encoding="utf-8", delay=True)
+        fh.setLevel(level)
+        fh.setFormatter(fmt)
+        logger.addHandler(fh)
@@ -14,11 +14,11 @@ Ce que vous devez faire :
 from __future__ import annotations
 
 from dataclasses import dataclass
-from datetime import datetime
+from datetime import datetime, timezone
 from typing import Optional
 
 
-@dataclass(frozen=True)
+@dataclass(frozen=True, slots=True)
 class Product:
     """Un produit stocké dans la table `products`."""
 
@@ -32,7 +32,7 @@ class Product:
     created_at: Optional[str] = None
 
 
-@dataclass(frozen=True)
+@dataclass(frozen=True, slots=True)
 class Sale:
     """Une vente enregistrée dans la table `sales` (à compléter en exercice)."""
 
@@ -49,4 +49,4 @@ class Sale:
 
 def now_iso() -> str:
     """Date UTC ISO-8601 (ex: 2025-12-13T12:00:00Z)."""
-    return datetime.utcnow().replace(microsecond=0).isoformat() + "Z"
+    return datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
@@ -23,10 +23,11 @@ from __future__ import annotations
 import logging
 import sqlite3
 from contextlib import contextmanager
-from typing import Iterable, List, Optional
+from typing import Iterable, Iterator, List, Optional
 
-from .exceptions import DatabaseError
+from .exceptions import DatabaseError, DuplicateSkuError, NotFoundError, StockError
 from .models import Product, Sale, now_iso
+from .utils import calc_totals_cents, round_half_up
 
 logger = logging.getLogger(__name__)
 
@@ -41,7 +42,8 @@ CREATE TABLE IF NOT EXISTS products (
   unit_price_ht REAL NOT NULL CHECK(unit_price_ht >= 0),
   vat_rate REAL NOT NULL DEFAULT 0.20 CHECK(vat_rate >= 0 AND vat_rate <= 1),
   quantity INTEGER NOT NULL CHECK(quantity >= 0),
-  created_at TEXT NOT NULL
+  created_at TEXT NOT NULL,
+  unit_ttc REAL GENERATED ALWAYS AS (ROUND(unit_price_ht * (1 + vat_rate), 2)) VIRTUAL
 );
 
 CREATE TABLE IF NOT EXISTS sales (
@@ -58,179 +60,391 @@ CREATE TABLE IF NOT EXISTS sales (
   FOREIGN KEY(product_id) REFERENCES products(id) ON DELETE RESTRICT
 );
 
+-- Totaux cumulés des ventes (une seule ligne), mis à jour dans la transaction de vente :
+-- le tableau de bord lit une ligne au lieu d'agréger toute la table `sales`.
+-- Montants en centimes (entiers) : les sommes restent exactes.
+CREATE TABLE IF NOT EXISTS sales_totals (
+  id INTEGER PRIMARY KEY CHECK(id = 1),
+  nb_ventes INTEGER NOT NULL,
+  qty_totale INTEGER NOT NULL,
+  ca_ht_cents INTEGER NOT NULL,
+  tva_totale_cents INTEGER NOT NULL,
+  ca_ttc_cents INTEGER NOT NULL
+);
+
+-- Initialisation (ou rattrapage d'une base existante) depuis `sales`, une seule fois.
+INSERT OR IGNORE INTO sales_totals(id, nb_ventes, qty_totale, ca_ht_cents, tva_totale_cents, ca_ttc_cents)
+SELECT 1, COUNT(*), COALESCE(SUM(quantity), 0),
+       COALESCE(SUM(CAST(ROUND(total_ht * 100) AS INTEGER)), 0),
+       COALESCE(SUM(CAST(ROUND(total_vat * 100) AS INTEGER)), 0),
+       COALESCE(SUM(CAST(ROUND(total_ttc * 100) AS INTEGER)), 0)
+FROM sales
+WHERE NOT EXISTS (SELECT 1 FROM sales_totals);
+
 CREATE INDEX IF NOT EXISTS idx_products_sku ON products(sku);
 CREATE INDEX IF NOT EXISTS idx_products_category ON products(category);
 CREATE INDEX IF NOT EXISTS idx_sales_sku ON sales(sku);
 """
 
+# Instructions du schéma une par une : exécutables dans une transaction, alors que
+# executescript() validerait d'abord la transaction en cours (pas de ';' dans les commentaires).
+SCHEMA_STATEMENTS = tuple(stmt.strip() for stmt in SCHEMA_SQL.split(";") if stmt.strip())
+
+# Requêtes fréquentes : texte SQL constant, donc réutilisé tel quel par le
+# cache de requêtes préparées de la connexion (cached_statements).
+_SQL_INSERT_PRODUCT = """
+INSERT INTO products(sku,name,category,unit_price_ht,vat_rate,quantity,created_at)
+VALUES(?,?,?,?,?,?,?)
+"""
+_PRODUCT_COLUMNS = "id, sku, name, category, unit_price_ht, vat_rate, quantity, created_at"
+# Pagination par clé (seek) sur l'index de `sku` : LIMIT -1 = pas de limite.
+_SQL_LIST_PRODUCTS = f"SELECT {_PRODUCT_COLUMNS} FROM products WHERE sku > ? ORDER BY sku ASC LIMIT ?"
+_SQL_LIST_FOR_DISPLAY = """
+SELECT id, sku, name, category, unit_price_ht, vat_rate, quantity, unit_ttc
+FROM products WHERE sku > ? ORDER BY sku ASC LIMIT ?
+"""
+_SQL_GET_BY_SKU = f"SELECT {_PRODUCT_COLUMNS} FROM products WHERE sku = ?"
+_SQL_STOCK_BY_SKU = "SELECT quantity FROM products WHERE sku = ?"
+_SQL_DELETE_PRODUCT = "DELETE FROM products WHERE sku = ?"
+_SQL_SELL_UPDATE = """
+UPDATE products SET quantity = quantity - ?
+WHERE sku = ? AND quantity >= ?
+RETURNING id, unit_price_ht, vat_rate
+"""
+_SQL_INSERT_SALE = """
+INSERT INTO sales(product_id,sku,quantity,unit_price_ht,vat_rate,total_ht,total_vat,total_ttc,sold_at)
+VALUES(?,?,?,?,?,?,?,?,?)
+"""
+_SQL_UPDATE_SALES_TOTALS = """
+UPDATE sales_totals SET
+    nb_ventes = nb_ventes + 1,
+    qty_totale = qty_totale + ?,
+    ca_ht_cents = ca_ht_cents + ?,
+    tva_totale_cents = tva_totale_cents + ?,
+    ca_ttc_cents = ca_ttc_cents + ?
+WHERE id = 1
+"""
+_SQL_DASHBOARD = """
+SELECT nb_ventes, qty_totale, ca_ht_cents, tva_totale_cents, ca_ttc_cents
+FROM sales_totals WHERE id = 1
+"""
+
+# Tables et index attendus, vérifiés en lecture seule avant toute mise à niveau.
+_SCHEMA_OBJECTS = frozenset({
+    "products", "sales", "sales_totals",
+    "idx_products_sku", "idx_products_category", "idx_sales_sku",
+})
+
+# Colonne générée ajoutée après coup : ALTER TABLE pour les bases créées avant elle.
+_SQL_ADD_UNIT_TTC = (
+    "ALTER TABLE products ADD COLUMN "
+    "unit_ttc REAL GENERATED ALWAYS AS (ROUND(unit_price_ht * (1 + vat_rate), 2)) VIRTUAL"
+)
+
+# Taille du cache de requêtes préparées (par connexion).
+STATEMENT_CACHE_SIZE = 256
+
+# PRAGMAs appliqués une seule fois, à l'ouverture de la connexion persistante.
+CONNECTION_PRAGMAS = (
+    "PRAGMA journal_mode = WAL",
+    "PRAGMA foreign_keys = ON",
+    "PRAGMA synchronous = NORMAL",
+    "PRAGMA temp_store = MEMORY",
+    "PRAGMA cache_size = -20000",
+    "PRAGMA mmap_size = 268435456",
+)
+
+
+def _product_from_row(r) -> Product:
+    """Construit un Product depuis une ligne ordonnée comme `_PRODUCT_COLUMNS`.
+
+    Les types viennent déjà du schéma (INTEGER/REAL/TEXT) : pas de conversion.
+    """
+    return Product(
+        id=r[0],
+        sku=r[1],
+        name=r[2],
+        category=r[3],
+        unit_price_ht=r[4],
+        vat_rate=r[5],
+        quantity=r[6],
+        created_at=r[7],
+    )
+
 
 class SQLiteRepository:
-    """Repository SQLite minimal (starter)."""
+    """Repository SQLite minimal (starter).
+
+    Une seule connexion est ouverte (au premier besoin) puis réutilisée par
+    toutes les méthodes ; appeler `close()` en fin de programme.
+    """
 
     def __init__(self, db_path: str) -> None:
         self.db_path = db_path
+        self._conn: Optional[sqlite3.Connection] = None
+
+    def _open(self) -> sqlite3.Connection:
+        """Ouvre la connexion persistante (row_factory + PRAGMAs) et met le schéma à niveau.
+
+        La mise à niveau est faite une fois par connexion : une base créée par une
+        version antérieure (sans `sales_totals`) est utilisable par tous les use-cases.
+        """
+        # isolation_level=None : pas de BEGIN implicite, les transactions passent par `transaction()`.
+        conn = sqlite3.connect(self.db_path, cached_statements=STATEMENT_CACHE_SIZE, isolation_level=None)
+        try:
+            conn.row_factory = sqlite3.Row
+            for pragma in CONNECTION_PRAGMAS:
+                conn.execute(pragma)
+            self._ensure_schema(conn)
+        except BaseException:
+            conn.close()
+            raise
+        return conn
 
     @contextmanager
     def connect(self) -> Iterable[sqlite3.Connection]:
-        """Connexion SQLite avec FK activées."""
+        """Connexion SQLite persistante (FK activées, WAL). Ne ferme pas la connexion."""
         try:
-            conn = sqlite3.connect(self.db_path)
-            conn.row_factory = sqlite3.Row
-            conn.execute("PRAGMA foreign_keys = ON")
-            yield conn
+            if self._conn is None:
+                self._conn = self._open()
+            yield self._conn
         except sqlite3.Error as e:
             raise DatabaseError(f"Erreur SQLite: {e}") from e
-        finally:
+
+    def close(self) -> None:
+        """Ferme la connexion persistante (si ouverte)."""
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+    @contextmanager
+    def transaction(self) -> Iterator[sqlite3.Connection]:
+        """Transaction explicite : BEGIN IMMEDIATE ... COMMIT, ROLLBACK sur exception.
+
+        Réentrante : appelée dans une transaction déjà ouverte, elle la rejoint
+        (un seul COMMIT pour plusieurs opérations).
+        """
+        with self.connect() as conn:
+            if conn.in_transaction:
+                yield conn
+                return
+            conn.execute("BEGIN IMMEDIATE")
             try:
-                conn.close()  # type: ignore[name-defined]
-            except Exception:
-                pass
+                yield conn
+                conn.execute("COMMIT")
+            except BaseException:
+                if conn.in_transaction:
+                    conn.execute("ROLLBACK")
+                raise
+
+    def _apply_schema(self, conn: sqlite3.Connection) -> None:
+        """Crée tables/index manquants et ajoute les colonnes apparues depuis."""
+        for statement in SCHEMA_STATEMENTS:
+            conn.execute(statement)
+        columns = {row[1] for row in conn.execute("PRAGMA table_xinfo(products)")}
+        if "unit_ttc" not in columns:
+            conn.execute(_SQL_ADD_UNIT_TTC)
+
+    def _schema_is_current(self, conn: sqlite3.Connection) -> bool:
+        """Vrai si le schéma est complet (lectures seules, aucun verrou d'écriture)."""
+        names = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type IN ('table', 'index')")}
+        if not _SCHEMA_OBJECTS <= names:
+            return False
+        columns = {row[1] for row in conn.execute("PRAGMA table_xinfo(products)")}
+        if "unit_ttc" not in columns:
+            return False
+        return conn.execute("SELECT 1 FROM sales_totals").fetchone() is not None
+
+    def _ensure_schema(self, conn: sqlite3.Connection) -> None:
+        """Met le schéma à niveau si besoin.
+
+        Vérification en lecture d'abord : la transaction d'écriture (BEGIN IMMEDIATE)
+        n'est ouverte que s'il manque quelque chose, un schéma à jour ne bloque personne.
+        """
+        if self._schema_is_current(conn):
+            return
+        if conn.in_transaction:  # appelée dans `transaction()` : s'y joint
+            self._apply_schema(conn)
+            return
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            self._apply_schema(conn)
+            conn.execute("COMMIT")
+        except BaseException:
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            raise
 
     def reset_and_create_schema(self) -> None:
         """Supprime les tables puis recrée le schéma (remise à zéro)."""
-        with self.connect() as conn:
+        with self.transaction() as conn:
             try:
+                conn.execute("DROP TABLE IF EXISTS sales_totals")
                 conn.execute("DROP TABLE IF EXISTS sales")
                 conn.execute("DROP TABLE IF EXISTS products")
-                conn.executescript(SCHEMA_SQL)
-                conn.commit()
-                logger.info("DB reset + schema created.")
+                self._apply_schema(conn)
             except sqlite3.Error as e:
-                conn.rollback()
                 raise DatabaseError(f"Erreur création schéma: {e}") from e
+        logger.info("DB reset + schema created.")
 
     def create_schema_if_needed(self) -> None:
         """Crée le schéma si les tables n'existent pas (sans reset)."""
         with self.connect() as conn:
             try:
-                conn.executescript(SCHEMA_SQL)
-                conn.commit()
+                self._ensure_schema(conn)
             except sqlite3.Error as e:
-                conn.rollback()
                 raise DatabaseError(f"Erreur création schéma: {e}") from e
 
     def insert_product(self, p: Product) -> int:
-        with self.connect() as conn:
+        with self.transaction() as conn:
             try:
                 cur = conn.execute(
-                    """
-                    INSERT INTO products(sku,name,category,unit_price_ht,vat_rate,quantity,created_at)
-                    VALUES(?,?,?,?,?,?,?)
-                    """,
+                    _SQL_INSERT_PRODUCT,
                     (p.sku, p.name, p.category, p.unit_price_ht, p.vat_rate, p.quantity, p.created_at or now_iso()),
                 )
-                conn.commit()
-                return int(cur.lastrowid)
             except sqlite3.IntegrityError as e:
-                conn.rollback()
-                raise DatabaseError(f"Contrainte violée (SKU unique ?) : {e}") from e
+                if "UNIQUE" in str(e):
+                    raise DuplicateSkuError(f"SKU {p.sku} existe deja") from e
+                raise DatabaseError(f"Contrainte violée : {e}") from e
             except sqlite3.Error as e:
-                conn.rollback()
                 raise DatabaseError(f"Erreur insert produit: {e}") from e
+            return int(cur.lastrowid)
+
+    def insert_products_bulk(self, products: Iterable[Product]) -> int:
+        """Insère plusieurs produits en une seule transaction (import JSON).
+
+        `products` peut être un générateur : il est consommé au fil de l'insertion.
+        """
+        with self.transaction() as conn:
+            try:
+                cur = conn.executemany(
+                    _SQL_INSERT_PRODUCT,
+                    (
+                        (p.sku, p.name, p.category, p.unit_price_ht, p.vat_rate, p.quantity, p.created_at or now_iso())
+                        for p in products
+                    ),
+                )
+            except sqlite3.IntegrityError as e:
+                raise DatabaseError(f"Contrainte violée (SKU unique ?) : {e}") from e
+            except sqlite3.Error as e:
+                raise DatabaseError(f"Erreur insert produits: {e}") from e
+            return cur.rowcount
+
+    def iter_products(self, limit: Optional[int] = None, after_sku: Optional[str] = None) -> Iterator[Product]:
+        """Produits triés par SKU, produits un à un (sans tout charger en mémoire).
 
-    def list_products(self) -> List[Product]:
+        `limit`/`after_sku` pour paginer (page suivante = SKU > after_sku).
+        """
         with self.connect() as conn:
-            cur = conn.execute("SELECT * FROM products ORDER BY sku ASC")
-            out: List[Product] = []
-            for row in cur.fetchall():
-                out.append(Product(
-                    id=int(row["id"]),
-                    sku=str(row["sku"]),
-                    name=str(row["name"]),
-                    category=str(row["category"]),
-                    unit_price_ht=float(row["unit_price_ht"]),
-                    vat_rate=float(row["vat_rate"]),
-                    quantity=int(row["quantity"]),
-                    created_at=str(row["created_at"]),
-                ))
-            return out
+            cur = conn.cursor()
+            cur.row_factory = None  # tuples bruts : accès positionnel, sans sqlite3.Row
+            cur.execute(_SQL_LIST_PRODUCTS, (after_sku or "", -1 if limit is None else limit))
+            for r in cur:
+                yield _product_from_row(r)
+
+    def list_products(self, limit: Optional[int] = None, after_sku: Optional[str] = None) -> List[Product]:
+        """Comme `iter_products`, mais sous forme de liste."""
+        return list(self.iter_products(limit=limit, after_sku=after_sku))
+
+    def list_products_for_display(self, limit: Optional[int] = None, after_sku: Optional[str] = None) -> List[sqlite3.Row]:
+        """Lignes prêtes à afficher (prix TTC calculé par SQLite), même pagination que `list_products`."""
+        with self.connect() as conn:
+            cur = conn.execute(_SQL_LIST_FOR_DISPLAY, (after_sku or "", -1 if limit is None else limit))
+            return cur.fetchall()
 
     def get_product_by_sku(self, sku: str) -> Optional[Product]:
         with self.connect() as conn:
-            cur = conn.execute("SELECT * FROM products WHERE sku = ?", (sku,))
+            cur = conn.execute(_SQL_GET_BY_SKU, (sku,))
             row = cur.fetchone()
             if not row:
                 return None
-            return Product(
-                id=int(row["id"]),
-                sku=str(row["sku"]),
-                name=str(row["name"]),
-                category=str(row["category"]),
-                unit_price_ht=float(row["unit_price_ht"]),
-                vat_rate=float(row["vat_rate"]),
-                quantity=int(row["quantity"]),
-                created_at=str(row["created_at"]),
-            )
-
-    def update_product(self, sku: str, **updates) -> None:
+            return _product_from_row(row)
+
+    def update_product(self, sku: str, **updates) -> Optional[Product]:
+        """Met à jour un produit et le renvoie (UPDATE ... RETURNING), None si SKU inconnu."""
         allowed = {"name", "category", "unit_price_ht", "vat_rate", "quantity"}
         fields = [k for k in updates.keys() if k in allowed]
         if not fields:
-            return
+            return self.get_product_by_sku(sku)
         
         values = [updates[k] for k in fields]
         values.append(sku)
         set_clause = ", ".join([f"{f} = ?" for f in fields])
         
-        with self.connect() as conn:
+        with self.transaction() as conn:
             try:
-                conn.execute(
-                    f"UPDATE products SET {set_clause} WHERE sku = ?",
+                rows = conn.execute(
+                    f"UPDATE products SET {set_clause} WHERE sku = ? RETURNING {_PRODUCT_COLUMNS}",
                     values
-                )
-                conn.commit()
+                ).fetchall()
             except sqlite3.Error as e:
-                conn.rollback()
                 raise DatabaseError(f"Erreur update produit: {e}") from e
+            return _product_from_row(rows[0]) if rows else None
 
     def delete_product(self, sku: str) -> None:
-        with self.connect() as conn:
+        with self.transaction() as conn:
             try:
-                cur = conn.execute("DELETE FROM products WHERE sku = ?", (sku,))
-                if cur.rowcount == 0:
-                    raise DatabaseError(f"Produit {sku} introuvable")
-                conn.commit()
+                cur = conn.execute(_SQL_DELETE_PRODUCT, (sku,))
             except sqlite3.IntegrityError as e:
-                conn.rollback()
                 raise DatabaseError(f"Impossible de supprimer {sku}: produit lié à des ventes") from e
             except sqlite3.Error as e:
-                conn.rollback()
                 raise DatabaseError(f"Erreur suppression produit: {e}") from e
+            if cur.rowcount == 0:
+                raise DatabaseError(f"Produit {sku} introuvable")
 
-    def sell_product(self, sale: Sale) -> None:
-        with self.connect() as conn:
+    def sell_product(self, sku: str, quantity: int, sold_at: str) -> Sale:
+        """Vente atomique : décrément conditionnel du stock + INSERT vente (une transaction).
+
+        Le contrôle de stock est fait par le `WHERE quantity >= ?` de l'UPDATE :
+        pas de lecture préalable, donc pas de course entre deux ventes.
+        """
+        with self.transaction() as conn:
             try:
+                rows = conn.execute(_SQL_SELL_UPDATE, (quantity, sku, quantity)).fetchall()
+                if not rows:
+                    row = conn.execute(_SQL_STOCK_BY_SKU, (sku,)).fetchone()
+                    if row is None:
+                        raise NotFoundError(f"produit {sku} pas trouve")
+                    raise StockError(f"stock pas assez. il reste: {row['quantity']}")
+
+                product_id, unit_price_ht, vat_rate = rows[0]
+                # HT arrondi en une fois (prix x quantité) : un prix sous le centime n'est pas pré-arrondi.
+                ht_cents, vat_cents, ttc_cents = calc_totals_cents(
+                    round_half_up(unit_price_ht * quantity * 100), round_half_up(vat_rate * 10000)
+                )
+                sale = Sale(
+                    product_id=product_id,
+                    sku=sku,
+                    quantity=quantity,
+                    unit_price_ht=unit_price_ht,
+                    vat_rate=vat_rate,
+                    total_ht=ht_cents / 100,
+                    total_vat=vat_cents / 100,
+                    total_ttc=ttc_cents / 100,
+                    sold_at=sold_at,
+                )
                 conn.execute(
-                    """INSERT INTO sales(product_id,sku,quantity,unit_price_ht,vat_rate,total_ht,total_vat,total_ttc,sold_at)
-                    VALUES(?,?,?,?,?,?,?,?,?)""",
+                    _SQL_INSERT_SALE,
                     (sale.product_id, sale.sku, sale.quantity, sale.unit_price_ht, sale.vat_rate,
                      sale.total_ht, sale.total_vat, sale.total_ttc, sale.sold_at)
                 )
                 conn.execute(
-                    "UPDATE products SET quantity = quantity - ? WHERE sku = ?",
-                    (sale.quantity, sale.sku)
+                    _SQL_UPDATE_SALES_TOTALS,
+                    (quantity, ht_cents, vat_cents, ttc_cents),
                 )
-                conn.commit()
             except sqlite3.Error as e:
-                conn.rollback()
                 raise DatabaseError(f"Erreur vente: {e}") from e
+            return sale
 
     def get_dashboard_stats(self) -> dict:
+        """Totaux des ventes, lus dans `sales_totals` (O(1), pas de scan de `sales`)."""
         with self.connect() as conn:
-            cur = conn.execute(
-                """SELECT 
-                    COUNT(*) as nb_ventes,
-                    COALESCE(SUM(quantity), 0) as qty_totale,
-                    COALESCE(SUM(total_ht), 0) as ca_ht,
-                    COALESCE(SUM(total_vat), 0) as tva_totale,
-                    COALESCE(SUM(total_ttc), 0) as ca_ttc
-                FROM sales"""
-            )
-            row = cur.fetchone()
+            cur = conn.execute(_SQL_DASHBOARD)
+            nb_ventes, qty_totale, ca_ht_cents, tva_cents, ca_ttc_cents = cur.fetchone() or (0, 0, 0, 0, 0)
             return {
-                "nb_ventes": int(row["nb_ventes"]),
-                "qty_totale": int(row["qty_totale"]),
-                "ca_ht": round(float(row["ca_ht"]), 2),
-                "tva_totale": round(float(row["tva_totale"]), 2),
-                "ca_ttc": round(float(row["ca_ttc"]), 2),
+                "nb_ventes": nb_ventes,
+                "qty_totale": qty_totale,
+                "ca_ht": ca_ht_cents / 100,
+                "tva_totale": tva_cents / 100,
+                "ca_ttc": ca_ttc_cents / 100,
             }
@@ -17,13 +17,13 @@ Ce que vous devez faire :
 from __future__ import annotations
 
 import logging
-from typing import List, Optional
+from typing import Iterator, List, Optional
 
 from .config import AppConfig
-from .exceptions import ValidationError
+from .exceptions import DatabaseError, DuplicateSkuError, NotFoundError, StockError, ValidationError
 from .models import Product, now_iso
 from .repository import SQLiteRepository
-from .utils import load_initial_json
+from .utils import iter_initial_products, read_initial_json
 
 logger = logging.getLogger(__name__)
 
@@ -35,38 +35,53 @@ class InventoryManager:
         self.config = config
         self.repo = repo or SQLiteRepository(config.db_path)
 
+    def close(self) -> None:
+        """Libère les ressources (connexion SQLite)."""
+        self.repo.close()
+
     def initialize_from_json(self, json_path: str, reset: bool = True) -> int:
-        """Initialise la DB depuis un JSON."""
+        """Initialise la DB depuis un JSON.
+
+        Reset éventuel + insertion dans une seule transaction : les produits sont
+        validés au fil de l'insertion et une erreur annule tout (base inchangée).
+        """
         logger.info("Initialization requested from JSON: %s", json_path)
-        payload = load_initial_json(json_path)
-        products = payload["products"]
-
-        if reset:
-            self.repo.reset_and_create_schema()
-        else:
-            self.repo.create_schema_if_needed()
-
-        count = 0
-        for p in products:
-            prod = Product(
-                sku=p["sku"],
-                name=p["name"],
-                category=p["category"],
-                unit_price_ht=p["unit_price_ht"],
-                quantity=p["quantity"],
-                vat_rate=p["vat_rate"],
-                created_at=now_iso(),
+        vat_default, raw_products = read_initial_json(json_path)
+
+        created_at = now_iso()  # même horodatage pour tout l'import
+        with self.repo.transaction():
+            if reset:
+                self.repo.reset_and_create_schema()
+            else:
+                self.repo.create_schema_if_needed()
+
+            count = self.repo.insert_products_bulk(
+                Product(
+                    sku=p["sku"],
+                    name=p["name"],
+                    category=p["category"],
+                    unit_price_ht=p["unit_price_ht"],
+                    quantity=p["quantity"],
+                    vat_rate=p["vat_rate"],
+                    created_at=created_at,
+                )
+                for p in iter_initial_products(raw_products, vat_default)
             )
-            self.repo.insert_product(prod)
-            count += 1
 
         logger.info("Initialization OK. %d products inserted.", count)
         return count
 
-    def list_inventory(self) -> List[Product]:
-        """Retourne la liste des produits (inventaire)."""
-        self.repo.create_schema_if_needed()
-        return self.repo.list_products()
+    def list_inventory(self, limit: Optional[int] = None, after_sku: Optional[str] = None) -> List[Product]:
+        """Retourne la liste des produits (inventaire), éventuellement une page seulement."""
+        return self.repo.list_products(limit=limit, after_sku=after_sku)
+
+    def iter_inventory(self) -> Iterator[Product]:
+        """Parcourt l'inventaire produit par produit (flux, mémoire constante)."""
+        return self.repo.iter_products()
+
+    def list_inventory_for_display(self, limit: Optional[int] = None, after_sku: Optional[str] = None) -> list:
+        """Inventaire pour l'affichage : lignes SQLite avec la colonne calculée `unit_ttc`."""
+        return self.repo.list_products_for_display(limit=limit, after_sku=after_sku)
 
     def add_product(self, sku: str, name: str, category: str, unit_price_ht: float, quantity: int, vat_rate: Optional[float] = None) -> Product:
         if unit_price_ht < 0:
@@ -76,10 +91,6 @@ class InventoryManager:
         if vat_rate is not None and (vat_rate < 0 or vat_rate > 1):
             raise ValidationError("tva doit etre entre 0 et 1")
         
-        existing = self.repo.get_product_by_sku(sku)
-        if existing:
-            raise ValidationError(f"SKU {sku} existe deja")
-        
         vat = vat_rate if vat_rate is not None else self.config.default_vat_rate
         product = Product(
             sku=sku,
@@ -90,15 +101,14 @@ class InventoryManager:
             quantity=quantity,
             created_at=now_iso()
         )
-        self.repo.insert_product(product)
+        try:
+            self.repo.insert_product(product)
+        except DuplicateSkuError as e:
+            raise ValidationError(f"SKU {sku} existe deja") from e
         logger.info("produit ajoute: %s", sku)
         return product
 
     def update_product(self, sku: str, **updates) -> Product:
-        product = self.repo.get_product_by_sku(sku)
-        if not product:
-            raise ValidationError(f"produit {sku} pas trouve")
-        
         if "unit_price_ht" in updates and updates["unit_price_ht"] < 0:
             raise ValidationError("prix negatif pas possible")
         if "quantity" in updates and updates["quantity"] < 0:
@@ -109,9 +119,10 @@ class InventoryManager:
         if "unit_price_ht" in updates:
             updates["unit_price_ht"] = round(updates["unit_price_ht"], 2)
         
-        self.repo.update_product(sku, **updates)
+        updated = self.repo.update_product(sku, **updates)
+        if not updated:
+            raise ValidationError(f"produit {sku} pas trouve")
         logger.info("produit modifie: %s", sku)
-        updated = self.repo.get_product_by_sku(sku)
         return updated
 
     def delete_product(self, sku: str) -> None:
@@ -131,37 +142,18 @@ class InventoryManager:
         if quantity <= 0:
             raise ValidationError("quantite doit etre > 0")
         
-        product = self.repo.get_product_by_sku(sku)
-        if not product:
-            raise ValidationError(f"produit {sku} pas trouve")
-        
-        if product.quantity < quantity:
-            raise ValidationError(f"stock pas assez. il reste: {product.quantity}")
-        
-        total_ht = round(product.unit_price_ht * quantity, 2)
-        total_vat = round(total_ht * product.vat_rate, 2)
-        total_ttc = round(total_ht + total_vat, 2)
-        
-        from .models import Sale
-        sale = Sale(
-            product_id=product.id,
-            sku=sku,
-            quantity=quantity,
-            unit_price_ht=product.unit_price_ht,
-            vat_rate=product.vat_rate,
-            total_ht=total_ht,
-            total_vat=total_vat,
-            total_ttc=total_ttc,
-            sold_at=now_iso()
-        )
-        
-        self.repo.sell_product(sale)
+        try:
+            sale = self.repo.sell_product(sku, quantity, now_iso())
+        except NotFoundError as e:
+            raise ValidationError(str(e)) from e
+        except StockError as e:
+            raise ValidationError(str(e)) from e
         logger.info("vente ok: %s x%d", sku, quantity)
         
         return {
-            "total_ht": total_ht,
-            "total_vat": total_vat,
-            "total_ttc": total_ttc
+            "total_ht": sale.total_ht,
+            "total_vat": sale.total_vat,
+            "total_ttc": sale.total_ttc
         }
 
     def get_dashboard(self) -> dict:
@@ -19,10 +19,19 @@ from __future__ import annotations
 
 import json
 import os
-from typing import Any, Dict, List, Tuple
+from collections import Counter
+from itertools import starmap
+from typing import Any, Dict, Iterator, List, Tuple
 
 from .exceptions import DataImportError, ValidationError
 
+try:  # parseur JSON accéléré, optionnel (pip install orjson) ; stdlib `json` sinon
+    import orjson
+
+    _json_loads = orjson.loads
+except ImportError:
+    _json_loads = json.loads
+
 
 def ensure_file_exists(path: str) -> None:
     if not path or not os.path.isfile(path):
@@ -30,6 +39,11 @@ def ensure_file_exists(path: str) -> None:
 
 
 def to_float(value: Any, field: str) -> float:
+    # Cas courant (float déjà décodé par le parseur JSON) : pas de try/except.
+    # `type(...) is` plutôt qu'isinstance : exclut bool et évite le parcours du MRO.
+    # Un int passe par le try : float(10**400) lève OverflowError.
+    if type(value) is float:
+        return value
     try:
         return float(value)
     except Exception as e:
@@ -37,66 +51,99 @@ def to_float(value: Any, field: str) -> float:
 
 
 def to_int(value: Any, field: str) -> int:
+    if type(value) is int:
+        return value
     try:
         return int(value)
     except Exception as e:
         raise ValidationError(f"Champ '{field}' invalide (int attendu).") from e
 
 
+def _as_text(value: Any) -> str:
+    """Champ texte du JSON : déjà `str` en pratique (pas de copie) ; nombre -> str ; absent/null -> ""."""
+    if type(value) is str:
+        return value
+    return "" if value is None else str(value)
+
+
 def validate_sku(sku: str) -> str:
-    sku = (sku or "").strip()
-    if not sku:
+    if not isinstance(sku, str) or not (sku := sku.strip()):
         raise ValidationError("SKU obligatoire.")
     return sku
 
 
 def validate_non_empty(text: str, field: str) -> str:
-    text = (text or "").strip()
-    if not text:
+    if not isinstance(text, str) or not (text := text.strip()):
         raise ValidationError(f"{field} obligatoire.")
     return text
 
 
 def validate_vat_rate(rate: float) -> float:
-    if rate < 0 or rate > 1:
+    # Comparaison chaînée + `not` : rejette aussi NaN (toute comparaison avec NaN est fausse).
+    if not (0.0 <= rate <= 1.0):
         raise ValidationError("TVA invalide (attendu entre 0 et 1).")
     return rate
 
 
 def validate_unit_price_ht(price: float) -> float:
-    if price < 0:
+    if not price >= 0.0:
         raise ValidationError("Prix HT invalide (>= 0).")
     return price
 
 
 def validate_quantity(qty: int, allow_zero: bool = True) -> int:
-    if allow_zero:
-        if qty < 0:
-            raise ValidationError("Quantité invalide (>= 0).")
-    else:
-        if qty <= 0:
-            raise ValidationError("Quantité invalide (> 0).")
+    if qty < (0 if allow_zero else 1):
+        raise ValidationError("Quantité invalide (>= 0)." if allow_zero else "Quantité invalide (> 0).")
     return qty
 
 
 def calc_totals(unit_price_ht: float, quantity: int, vat_rate: float) -> Tuple[float, float, float]:
-    """Calcule HT/TVA/TTC avec arrondi à 2 décimales."""
-    total_ht = round(unit_price_ht * quantity, 2)
-    total_vat = round(total_ht * vat_rate, 2)
-    total_ttc = round(total_ht + total_vat, 2)
-    return total_ht, total_vat, total_ttc
+    """Calcule HT/TVA/TTC à 2 décimales.
 
+    Mêmes arrondis que la vente enregistrée : HT = prix x quantité arrondi une seule
+    fois au centime (`round_half_up`), puis calcul en centimes entiers via `calc_totals_cents`.
+    """
+    total_ht, total_vat, total_ttc = calc_totals_cents(
+        round_half_up(unit_price_ht * quantity * 100), round_half_up(vat_rate * 10000)
+    )
+    return total_ht / 100, total_vat / 100, total_ttc / 100
 
-def load_initial_json(path: str) -> Dict[str, Any]:
-    """Charge et valide le JSON d'initialisation fourni par l'utilisateur."""
-    ensure_file_exists(path)
+
+def round_half_up(value: float) -> int:
+    """Arrondit un montant positif à l'entier, demi vers le haut (même règle que ROUND() de SQLite)."""
+    return int(value + 0.5)
+
+
+def calc_totals_cents(total_ht_cents: int, vat_rate_bp: int) -> Tuple[int, int, int]:
+    """Calcule HT/TVA/TTC en centimes (entiers) depuis le HT en centimes, TVA en points de base (0.20 -> 2000).
+
+    Le HT est arrondi une seule fois par l'appelant (prix x quantité), jamais le prix
+    unitaire seul. Arithmétique entière ensuite ; la TVA est arrondie au centime (demi supérieur).
+    """
+    total_vat = (total_ht_cents * vat_rate_bp + 5000) // 10000
+    return total_ht_cents, total_vat, total_ht_cents + total_vat
+
+
+def read_initial_json(path: str) -> Tuple[float, List[Any]]:
+    """Lit le JSON d'initialisation et valide sa structure.
+
+    Retourne (TVA par défaut, liste brute des produits) ; les produits eux-mêmes
+    sont validés par `iter_initial_products`.
+    """
+    # Pas de stat préalable (ensure_file_exists) : l'ouverture suffit à détecter l'absence.
     try:
-        with open(path, "r", encoding="utf-8") as f:
-            data = json.load(f)
-    except json.JSONDecodeError as e:
-        raise DataImportError("JSON invalide (erreur de parsing).") from e
-    except Exception as e:
+        # Octets (les deux parseurs décodent l'UTF-8 eux-mêmes), sans tampon : FileIO.readall()
+        # dimensionne sa lecture d'après fstat(), le fichier est lu en un seul read().
+        with open(path, "rb", buffering=0) as f:
+            raw = f.read()
+    except FileNotFoundError as e:
+        raise ValidationError(f"Fichier introuvable: {path}") from e
+    except OSError as e:
         raise DataImportError("Impossible de lire le fichier JSON.") from e
+    try:
+        data = _json_loads(raw)
+    except ValueError as e:  # JSONDecodeError (json/orjson), UTF-8 invalide
+        raise DataImportError("JSON invalide (erreur de parsing).") from e
 
     if not isinstance(data, dict):
         raise DataImportError("JSON invalide: objet racine attendu.")
@@ -106,34 +153,55 @@ def load_initial_json(path: str) -> Dict[str, Any]:
         raise DataImportError("JSON invalide: 'products' doit être une liste non vide.")
 
     vat_default = validate_vat_rate(to_float(data.get("vat_rate_default", 0.20), "vat_rate_default"))
+    _check_duplicate_skus(products)
+    return vat_default, products
+
+
+def _check_duplicate_skus(products: List[Any]) -> None:
+    """Rejette les SKU en double avant tout accès à la base (une passe, doublons détectés en C)."""
+    skus = [sku for p in products if isinstance(p, dict) and (sku := _as_text(p.get("sku")).strip())]
+    if len(set(skus)) != len(skus):
+        dup = next(sku for sku, n in Counter(skus).items() if n > 1)
+        raise DataImportError(f"SKU dupliqué: {dup}")
+
+
+def iter_initial_products(products: List[Any], vat_default: float) -> Iterator[Dict[str, Any]]:
+    """Valide et normalise les produits un par un (générateur, pas de seconde liste en mémoire).
+
+    L'unicité des SKU est vérifiée en amont par `read_initial_json`.
+    """
+
+    # Références locales pour la boucle (LOAD_FAST au lieu de LOAD_GLOBAL / attributs).
+    _to_float, _to_int = to_float, to_int
+    _text, _sku, _non_empty = _as_text, validate_sku, validate_non_empty
+    _price, _qty, _vat = validate_unit_price_ht, validate_quantity, validate_vat_rate
 
-    seen: set[str] = set()
-    normalized: List[Dict[str, Any]] = []
     for i, p in enumerate(products, start=1):
         if not isinstance(p, dict):
             raise DataImportError(f"Produit #{i} invalide: objet attendu.")
 
-        sku = validate_sku(str(p.get("sku", "")))
-        if sku in seen:
-            raise DataImportError(f"SKU dupliqué: {sku}")
-        seen.add(sku)
+        get = p.get  # une seule résolution de méthode par produit
+        sku = _sku(_text(get("sku")))
+        name = _non_empty(_text(get("name")), "name")
+        category = _non_empty(_text(get("category")), "category")
+        unit_price_ht = _price(_to_float(get("unit_price_ht"), "unit_price_ht"))
+        quantity = _qty(_to_int(get("quantity"), "quantity"), allow_zero=True)
+        vat_rate = _vat(_to_float(get("vat_rate", vat_default), "vat_rate"))
 
-        name = validate_non_empty(str(p.get("name", "")), "name")
-        category = validate_non_empty(str(p.get("category", "")), "category")
-        unit_price_ht = validate_unit_price_ht(to_float(p.get("unit_price_ht", None), "unit_price_ht"))
-        quantity = validate_quantity(to_int(p.get("quantity", None), "quantity"), allow_zero=True)
-        vat_rate = validate_vat_rate(to_float(p.get("vat_rate", vat_default), "vat_rate"))
-
-        normalized.append({
+        yield {
             "sku": sku,
             "name": name,
             "category": category,
             "unit_price_ht": unit_price_ht,
             "quantity": quantity,
             "vat_rate": vat_rate,
-        })
+        }
 
-    return {"vat_rate_default": vat_default, "products": normalized}
+
+def load_initial_json(path: str) -> Dict[str, Any]:
+    """Charge et valide le JSON d'initialisation fourni par l'utilisateur."""
+    vat_default, products = read_initial_json(path)
+    return {"vat_rate_default": vat_default, "products": list(iter_initial_products(products, vat_default))}
 
 
 def format_table(headers: List[str], rows: List[List[str]]) -> str:
@@ -141,15 +209,19 @@ def format_table(headers: List[str], rows: List[List[str]]) -> str:
     if not rows:
         return "(aucune donnée)"
 
-    widths = [len(h) for h in headers]
-    for r in rows:
-        for i, cell in enumerate(r):
-            widths[i] = max(widths[i], len(cell))
+    # Lignes incomplètes complétées par des cellules vides : zip() ne doit tronquer aucune colonne.
+    width = len(headers)
+    lengths = set(map(len, rows))
+    if lengths != {width}:
+        if max(lengths) > width:
+            raise ValueError("Ligne plus longue que les en-têtes.")
+        rows = [[*r, *[""] * (width - len(r))] for r in rows]
+
+    # Largeur de colonne = plus longue cellule (en-tête compris) ; boucles internes en C.
+    widths = [max(map(len, column)) for column in zip(headers, *rows)]
 
-    def fmt_row(r: List[str]) -> str:
-        return " | ".join(cell.ljust(widths[i]) for i, cell in enumerate(r))
+    # Gabarit de ligne construit une fois ("{:<3} | {:<5}...") puis appliqué à chaque ligne.
+    row_tpl = " | ".join([f"{{:<{w}}}" for w in widths])
 
-    sep = "-+-".join("-" * w for w in widths)
-    out = [fmt_row(headers), sep]
-    out.extend(fmt_row(r) for r in rows)
-    return "\n".join(out)
+    sep = "-+-".join(["-" * w for w in widths])  # liste : join() n'a pas à matérialiser un générateur
+    return "\n".join([row_tpl.format(*headers), sep, *starmap(row_tpl.format, rows)])
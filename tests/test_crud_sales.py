@@ -1,9 +1,11 @@
+import sqlite3
 import tempfile
 import unittest
 from pathlib import Path
 
 from inventory.config import AppConfig
 from inventory.exceptions import ValidationError
+from inventory.models import Product
 from inventory.services import InventoryManager
 
 
@@ -16,6 +18,7 @@ class TestCRUD(unittest.TestCase):
         self.app.repo.create_schema_if_needed()
 
     def tearDown(self):
+        self.app.close()
         self.tmp_dir.cleanup()
 
     def test_add_product(self):
@@ -49,6 +52,44 @@ class TestCRUD(unittest.TestCase):
         with self.assertRaises(ValidationError):
             self.app.delete_product("P999")
 
+    def test_list_inventory_pages(self):
+        for i in range(5):
+            self.app.add_product(f"P00{i}", "Test", "Cat", 10.0, 5)
+        first = self.app.list_inventory(limit=2)
+        self.assertEqual([p.sku for p in first], ["P000", "P001"])
+        rest = self.app.list_inventory(limit=10, after_sku=first[-1].sku)
+        self.assertEqual([p.sku for p in rest], ["P002", "P003", "P004"])
+        self.assertEqual(len(self.app.list_inventory()), 5)
+
+    def test_iter_inventory(self):
+        self.app.add_product("P002", "B", "Cat", 10.0, 5)
+        self.app.add_product("P001", "A", "Cat", 10.0, 5)
+        self.assertEqual([p.sku for p in self.app.iter_inventory()], ["P001", "P002"])
+
+    def test_list_inventory_for_display_computes_ttc(self):
+        self.app.add_product("P999", "Test", "Cat", 10.0, 5, 0.055)
+        rows = self.app.list_inventory_for_display()
+        self.assertEqual(len(rows), 1)
+        self.assertEqual(rows[0]["unit_ttc"], 10.55)
+
+    def test_list_inventory_while_writer_holds_lock(self):
+        self.app.add_product("P999", "Test", "Cat", 10.0, 5)
+        self.app.close()  # la réouverture vérifie aussi le schéma pendant le verrou
+        other = sqlite3.connect(str(self.db_path), timeout=0, isolation_level=None)
+        other.execute("BEGIN IMMEDIATE")
+        try:
+            self.assertEqual([p.sku for p in self.app.list_inventory()], ["P999"])
+            self.assertEqual(len(self.app.list_inventory_for_display()), 1)
+        finally:
+            other.execute("ROLLBACK")
+            other.close()
+
+    def test_reuse_after_close(self):
+        self.app.add_product("P999", "Test", "Cat", 10.0, 5)
+        self.app.close()
+        product = self.app.repo.get_product_by_sku("P999")
+        self.assertEqual(product.quantity, 5)
+
 
 class TestSales(unittest.TestCase):
     def setUp(self):
@@ -60,6 +101,7 @@ class TestSales(unittest.TestCase):
         self.app.add_product("P001", "Produit", "Cat", 10.0, 20)
 
     def tearDown(self):
+        self.app.close()
         self.tmp_dir.cleanup()
 
     def test_sell_product(self):
@@ -75,10 +117,43 @@ class TestSales(unittest.TestCase):
         with self.assertRaises(ValidationError):
             self.app.sell_product("P001", 100)
 
+    def test_sell_product_insufficient_stock_leaves_stock_untouched(self):
+        with self.assertRaises(ValidationError) as ctx:
+            self.app.sell_product("P001", 21)
+        self.assertIn("20", str(ctx.exception))
+        product = self.app.repo.get_product_by_sku("P001")
+        self.assertEqual(product.quantity, 20)
+        self.assertEqual(self.app.get_dashboard()["nb_ventes"], 0)
+
+    def test_sell_whole_stock(self):
+        self.app.sell_product("P001", 20)
+        product = self.app.repo.get_product_by_sku("P001")
+        self.assertEqual(product.quantity, 0)
+
     def test_sell_product_not_found(self):
         with self.assertRaises(ValidationError):
             self.app.sell_product("P999", 1)
 
+    def test_delete_product_with_sales(self):
+        self.app.sell_product("P001", 1)
+        with self.assertRaises(ValidationError):
+            self.app.delete_product("P001")
+        self.assertIsNotNone(self.app.repo.get_product_by_sku("P001"))
+
+    def test_sell_sub_cent_price(self):
+        # Prix importé sans arrondi : le HT est arrondi sur prix x quantité, pas sur le prix seul.
+        self.app.repo.insert_product(Product("P002", "Vis", "Cat", 0.125, 10))
+        self.app.repo.insert_product(Product("P003", "Clou", "Cat", 0.333, 10))
+        self.assertEqual(self.app.sell_product("P002", 4)["total_ht"], 0.5)
+        self.assertEqual(self.app.sell_product("P003", 3)["total_ht"], 1.0)
+        stats = self.app.get_dashboard()
+        self.assertEqual(stats["ca_ht"], 1.5)
+
+    def test_dashboard_without_sales(self):
+        stats = self.app.get_dashboard()
+        self.assertEqual(stats["nb_ventes"], 0)
+        self.assertEqual(stats["ca_ttc"], 0.0)
+
     def test_dashboard(self):
         self.app.sell_product("P001", 2)
         self.app.sell_product("P001", 3)
@@ -90,3 +165,66 @@ class TestSales(unittest.TestCase):
         self.assertEqual(stats["tva_totale"], 10.0)
         self.assertEqual(stats["ca_ttc"], 60.0)
 
+
+# Schéma d'une base créée par une version antérieure : ni `sales_totals` ni `unit_ttc`.
+BASELINE_SCHEMA = """
+CREATE TABLE products (
+  id INTEGER PRIMARY KEY AUTOINCREMENT,
+  sku TEXT NOT NULL UNIQUE,
+  name TEXT NOT NULL,
+  category TEXT NOT NULL,
+  unit_price_ht REAL NOT NULL CHECK(unit_price_ht >= 0),
+  vat_rate REAL NOT NULL DEFAULT 0.20 CHECK(vat_rate >= 0 AND vat_rate <= 1),
+  quantity INTEGER NOT NULL CHECK(quantity >= 0),
+  created_at TEXT NOT NULL
+);
+CREATE TABLE sales (
+  id INTEGER PRIMARY KEY AUTOINCREMENT,
+  product_id INTEGER NOT NULL,
+  sku TEXT NOT NULL,
+  quantity INTEGER NOT NULL CHECK(quantity > 0),
+  unit_price_ht REAL NOT NULL CHECK(unit_price_ht >= 0),
+  vat_rate REAL NOT NULL CHECK(vat_rate >= 0 AND vat_rate <= 1),
+  total_ht REAL NOT NULL CHECK(total_ht >= 0),
+  total_vat REAL NOT NULL CHECK(total_vat >= 0),
+  total_ttc REAL NOT NULL CHECK(total_ttc >= 0),
+  sold_at TEXT NOT NULL,
+  FOREIGN KEY(product_id) REFERENCES products(id) ON DELETE RESTRICT
+);
+INSERT INTO products(sku, name, category, unit_price_ht, vat_rate, quantity, created_at)
+VALUES ('P001', 'Produit', 'Cat', 10.0, 0.2, 18, '2024-01-01T00:00:00');
+INSERT INTO sales(product_id, sku, quantity, unit_price_ht, vat_rate, total_ht, total_vat, total_ttc, sold_at)
+VALUES (1, 'P001', 2, 10.0, 0.2, 20.0, 4.0, 24.0, '2024-01-02T00:00:00');
+"""
+
+
+class TestBaselineDatabase(unittest.TestCase):
+    """Base existante (ancien schéma) : dashboard et vente sans passer par le listing."""
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.db_path = Path(self.tmp_dir.name) / "old.db"
+        conn = sqlite3.connect(str(self.db_path))
+        conn.executescript(BASELINE_SCHEMA)
+        conn.close()
+        self.app = InventoryManager(AppConfig(db_path=str(self.db_path)))
+
+    def tearDown(self):
+        self.app.close()
+        self.tmp_dir.cleanup()
+
+    def test_dashboard_includes_existing_sales(self):
+        stats = self.app.get_dashboard()
+        self.assertEqual(stats["nb_ventes"], 1)
+        self.assertEqual(stats["qty_totale"], 2)
+        self.assertEqual(stats["ca_ttc"], 24.0)
+
+    def test_sell_then_dashboard(self):
+        result = self.app.sell_product("P001", 3)
+        self.assertEqual(result["total_ttc"], 36.0)
+        stats = self.app.get_dashboard()
+        self.assertEqual(stats["nb_ventes"], 2)
+        self.assertEqual(stats["qty_totale"], 5)
+        self.assertEqual(stats["ca_ht"], 50.0)
+        self.assertEqual(stats["ca_ttc"], 60.0)
+        self.assertEqual(self.app.repo.get_product_by_sku("P001").quantity, 15)
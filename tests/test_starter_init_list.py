@@ -19,6 +19,7 @@ import unittest
 from pathlib import Path
 
 from inventory.config import AppConfig
+from inventory.exceptions import ValidationError
 from inventory.services import InventoryManager
 
 
@@ -45,3 +46,27 @@ class TestStarterInitList(unittest.TestCase):
             products = app.list_inventory()
             self.assertEqual(len(products), 2)
             self.assertEqual(products[0].sku, "P001")
+            app.close()
+
+    def test_failed_init_keeps_previous_data(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            tmp_path = Path(tmp)
+            db_path = tmp_path / "test.db"
+            good_path = tmp_path / "good.json"
+            bad_path = tmp_path / "bad.json"
+
+            good = {"products": [{"sku": "P001", "name": "A", "category": "C", "unit_price_ht": 1.0, "quantity": 1}]}
+            bad = {"products": [
+                {"sku": "P010", "name": "B", "category": "C", "unit_price_ht": 1.0, "quantity": 1},
+                {"sku": "P011", "name": "C", "category": "C", "unit_price_ht": -1.0, "quantity": 1},
+            ]}
+            good_path.write_text(json.dumps(good), encoding="utf-8")
+            bad_path.write_text(json.dumps(bad), encoding="utf-8")
+
+            app = InventoryManager(AppConfig(db_path=str(db_path)))
+            app.initialize_from_json(str(good_path), reset=True)
+            with self.assertRaises(ValidationError):
+                app.initialize_from_json(str(bad_path), reset=True)
+
+            self.assertEqual([p.sku for p in app.list_inventory()], ["P001"])
+            app.close()
@@ -0,0 +1,177 @@
+import json
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+
+from inventory.exceptions import DataImportError, ValidationError
+from inventory.utils import (
+    calc_totals,
+    calc_totals_cents,
+    format_table,
+    load_initial_json,
+    round_half_up,
+    to_float,
+    validate_non_empty,
+    validate_quantity,
+    validate_sku,
+    validate_unit_price_ht,
+    validate_vat_rate,
+)
+
+
+class TestCalcTotalsCents(unittest.TestCase):
+    def test_simple(self):
+        self.assertEqual(calc_totals_cents(2000, 2000), (2000, 400, 2400))
+
+    def test_vat_rounded_half_up(self):
+        # 5 centimes à 10 % = 0,5 centime -> 1 centime
+        self.assertEqual(calc_totals_cents(5, 1000), (5, 1, 6))
+
+    def test_reduced_vat(self):
+        # 49,90 x 3 à 5,5 % : 149,70 HT, 8,23 TVA (8,2335)
+        self.assertEqual(calc_totals_cents(14970, 550), (14970, 823, 15793))
+
+
+class TestCalcTotals(unittest.TestCase):
+    def test_matches_cents(self):
+        self.assertEqual(calc_totals(10.0, 2, 0.2), (20.0, 4.0, 24.0))
+        self.assertEqual(calc_totals(49.9, 3, 0.055), (149.7, 8.23, 157.93))
+
+    def test_no_float_drift(self):
+        # 0.1 x 3 vaut 0.30000000000000004 en flottant
+        self.assertEqual(calc_totals(0.1, 3, 0.0), (0.3, 0.0, 0.3))
+
+    def test_sub_cent_price_rounded_on_line_total(self):
+        # Même résultat que la vente : 4 x 0.125 = 0.50 (et non 4 x 0.13)
+        self.assertEqual(calc_totals(0.125, 4, 0.2), (0.5, 0.1, 0.6))
+        self.assertEqual(calc_totals(0.333, 3, 0.2), (1.0, 0.2, 1.2))
+
+    def test_round_half_up(self):
+        # round() arrondit au pair (12.5 -> 12), ROUND() de SQLite vers le haut
+        self.assertEqual(round_half_up(12.5), 13)
+        self.assertEqual(round_half_up(12.49), 12)
+
+
+class TestValidators(unittest.TestCase):
+    def test_sku_and_text_stripped(self):
+        self.assertEqual(validate_sku("  P001 "), "P001")
+        self.assertEqual(validate_non_empty(" Nom ", "name"), "Nom")
+        for bad in (None, "", "   ", 12):
+            with self.assertRaises(ValidationError):
+                validate_sku(bad)
+            with self.assertRaises(ValidationError):
+                validate_non_empty(bad, "name")
+
+    def test_vat_rate_bounds(self):
+        self.assertEqual(validate_vat_rate(0.0), 0.0)
+        self.assertEqual(validate_vat_rate(1.0), 1.0)
+        for bad in (-0.01, 1.01, float("nan")):
+            with self.assertRaises(ValidationError):
+                validate_vat_rate(bad)
+
+    def test_price_rejects_negative_and_nan(self):
+        self.assertEqual(validate_unit_price_ht(0.0), 0.0)
+        for bad in (-1.0, float("nan")):
+            with self.assertRaises(ValidationError):
+                validate_unit_price_ht(bad)
+
+    def test_to_float_overflow(self):
+        with self.assertRaises(ValidationError):
+            to_float(10**400, "unit_price_ht")
+
+    def test_quantity_allow_zero(self):
+        self.assertEqual(validate_quantity(0), 0)
+        with self.assertRaises(ValidationError):
+            validate_quantity(0, allow_zero=False)
+        with self.assertRaises(ValidationError):
+            validate_quantity(-1)
+
+
+class TestLoadInitialJson(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.json_path = Path(self.tmp_dir.name) / "init.json"
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_missing_file(self):
+        with self.assertRaises(ValidationError):
+            load_initial_json(str(self.json_path))
+
+    def test_invalid_json(self):
+        self.json_path.write_text("{pas du json", encoding="utf-8")
+        with self.assertRaises(DataImportError):
+            load_initial_json(str(self.json_path))
+
+    def test_utf8_names(self):
+        self.json_path.write_text(
+            '{"products": [{"sku": "P1", "name": "Câble", "category": "Bureau", "unit_price_ht": 1, "quantity": 2}]}',
+            encoding="utf-8",
+        )
+        payload = load_initial_json(str(self.json_path))
+        self.assertEqual(payload["products"][0]["name"], "Câble")
+        self.assertEqual(payload["products"][0]["vat_rate"], 0.20)
+
+    def test_huge_int_price_with_stdlib_json(self):
+        # Parseur stdlib forcé (orjson optionnel) : il décode l'entier, to_float doit le refuser.
+        self.json_path.write_text(
+            '{"products": [{"sku": "P1", "name": "A", "category": "C", "unit_price_ht": 1' + "0" * 400 + ', "quantity": 1}]}',
+            encoding="utf-8",
+        )
+        with mock.patch("inventory.utils._json_loads", json.loads):
+            with self.assertRaises(ValidationError):
+                load_initial_json(str(self.json_path))
+
+    def test_duplicate_sku(self):
+        self.json_path.write_text(
+            '{"products": ['
+            '{"sku": "P1", "name": "A", "category": "C", "unit_price_ht": 1, "quantity": 1},'
+            '{"sku": "P2", "name": "B", "category": "C", "unit_price_ht": 1, "quantity": 1},'
+            '{"sku": " P1 ", "name": "C", "category": "C", "unit_price_ht": 1, "quantity": 1}]}',
+            encoding="utf-8",
+        )
+        with self.assertRaisesRegex(DataImportError, "P1"):
+            load_initial_json(str(self.json_path))
+
+    def test_null_sku_rejected_numeric_sku_kept(self):
+        self.json_path.write_text(
+            '{"products": [{"sku": null, "name": "A", "category": "C", "unit_price_ht": 1, "quantity": 1}]}',
+            encoding="utf-8",
+        )
+        with self.assertRaises(ValidationError):
+            load_initial_json(str(self.json_path))
+
+        self.json_path.write_text(
+            '{"products": [{"sku": 123, "name": "A", "category": "C", "unit_price_ht": 1, "quantity": 1}]}',
+            encoding="utf-8",
+        )
+        self.assertEqual(load_initial_json(str(self.json_path))["products"][0]["sku"], "123")
+
+
+class TestFormatTable(unittest.TestCase):
+    def test_columns_aligned(self):
+        out = format_table(["A", "Nom"], [["1", "x"], ["22", "Câble"]])
+        self.assertEqual(out.splitlines(), [
+            "A  | Nom  ",
+            "---+------",
+            "1  | x    ",
+            "22 | Câble",
+        ])
+
+    def test_no_rows(self):
+        self.assertEqual(format_table(["A"], []), "(aucune donnée)")
+
+    def test_short_row_keeps_all_columns(self):
+        out = format_table(["A", "Nom", "Prix"], [["1", "x", "10"], ["22"]])
+        self.assertEqual(out.splitlines(), [
+            "A  | Nom | Prix",
+            "---+-----+-----",
+            "1  | x   | 10  ",
+            "22 |     |     ",
+        ])
+
+    def test_long_row_rejected(self):
+        with self.assertRaises(ValueError):
+            format_table(["A"], [["1", "2"]])